@@ -3,6 +3,10 @@
 The generator
 """
 import argparse
+import functools
+import itertools
+import operator
+import sys
 
 # =============================================================================
 
@@ -11,7 +15,7 @@ PINOUT = {
         {
             "clock": "W5",
             "led":
-                [
+                (
                     "U16",
                     "E19",
                     "U19",
@@ -28,9 +32,9 @@ PINOUT = {
                     "N3",
                     "P1",
                     "L1",
-                ],
+                ),
             "single-ended":
-                [
+                (
                     # Basys3 JB 1-4, 7-10
                     "A14",
                     "A16",
@@ -49,9 +53,9 @@ PINOUT = {
                     "M19",
                     "P17",
                     "R18"
-                ],
+                ),
             "differential":
-                [
+                (
                     # Basys3 JB
                     ("A14", "A15"),
                     ("A16", "A17"),
@@ -62,15 +66,15 @@ PINOUT = {
                     ("K17", "L17"),
                     ("N17", "P17"),
                     ("P18", "R18"),
-                ],
-            "iobanks": [16, 14],
+                ),
+            "iobanks": (16, 14),
         },
     "arty-full":
         {
             "clock":
                 "E3",
             "led":
-                [
+                (
                     "G6",  # R0
                     "G3",  # R1
                     "J3",  # R2
@@ -87,9 +91,9 @@ PINOUT = {
                     "J5",  # LED5
                     "T9",  # LED6
                     "T10",  # LED7
-                ],
+                ),
             "single-ended":
-                [
+                (
                     # Pmod JB
                     (15, "E15"),
                     (15, "E16"),
@@ -108,9 +112,9 @@ PINOUT = {
                     (14, "V14"),
                     (14, "T13"),
                     (14, "U13"),
-                ],
+                ),
             "differential":
-                [
+                (
                     # Pmod JB
                     (15, "E15", "E16"),
                     (15, "D15", "C15"),
@@ -121,7 +125,7 @@ PINOUT = {
                     (15, "V10", "V11"),
                     (15, "U14", "V14"),
                     (15, "T13", "U13"),
-                ]
+                )
         },
 
     # Pinout for "bottom" routing graph of 50t, only for Basys3. These pins may
@@ -131,7 +135,7 @@ PINOUT = {
         {
             "clock": "W5",  # Bank 34
             "led":
-                [
+                (
                     "V3",  # LED9
                     "W3",  # LED10
                     "U3",  # LED11
@@ -142,9 +146,9 @@ PINOUT = {
                     "U5",  # CE
                     "V5",  # CF
                     "U7",  # CG
-                ],
+                ),
             "single-ended":
-                [
+                (
                     # Basys3 JC 1-4, 7-10
                     "K17",
                     "M18",
@@ -158,241 +162,108 @@ PINOUT = {
                     "U16",
                     "V13",
                     "V14",
-                ],
+                ),
             "differential":
-                [
+                (
                     # Basys3 JC
                     ("M18", "M19"),
                     ("L17", "K17"),
                     ("P17", "N17"),
                     ("R18", "P18"),
-                ],
-            "iobanks": [14],
+                ),
+            "iobanks": (14, ),
         },
 }
 
-
-def unquote(s):
-    if isinstance(s, str):
-        return s.replace("\"", "")
-    return s
-
-
 # =============================================================================
 
-
-def generate_output(board, iostandard, drives, slews):
-    """
-    Generates a design which outputs 100Hz square wave to a number of pins
-    in which each one has different DRIVE+SLEW setting. The IOSTANDARD is
-    common for all of them.
-    """
-
-    num_ports = len(drives) * len(slews)
-    iosettings = {}
-
-    # Header
-    verilog = """
-module top(
-    input  wire clk,
-    output wire [{}:0] out
-);
-""".format(num_ports - 1)
-
-    pcf = """
-set_io clk {}
-""".format(PINOUT[board]["clock"])
-
-    # 100Hz square wave generator
-    verilog += """
-    wire        clk_bufg;
-    reg  [31:0] cnt_ps;
-    reg         tick;
-
-    BUFG bufg (.I(clk), .O(clk_bufg));
-
-    initial cnt_ps <= 0;
-    initial tick   <= 0;
-
-    always @(posedge clk_bufg)
-        if (cnt_ps >= (100000000 / (2*100)) - 1) begin
-            cnt_ps <= 0;
-            tick   <= !tick;
-        end else begin
-            cnt_ps <= cnt_ps + 1;
-            tick   <= tick;
-        end
-"""
-
-    # Output buffers
-    index = 0
-    for slew in slews:
-        for drive in drives:
-
-            params = {"IOSTANDARD": "\"{}\"".format(iostandard)}
-
-            if drive is not None:
-                params["DRIVE"] = int(drive)
-
-            if slew is not None:
-                params["SLEW"] = "\"{}\"".format(slew)
-
-            pin = PINOUT[board]["single-ended"][index][1]
-
-            verilog += """
+# Per-port Verilog templates. Formatted once per port instead of re-parsing
+# an inline format string on every loop iteration.
+_OBUF_TMPL = """
     OBUF # ({params}) obuf_{index} (
     .I(tick),
     .O(out[{index}])
     );
-            """.format(
-                params=",".join(
-                    [".{}({})".format(k, v) for k, v in params.items()]
-                ),
-                index=index
-            )
+            """
 
-            if num_ports > 1:
-                pcf += "set_io out[{}] {}\n".format(index, pin)
-            else:
-                pcf += "set_io out {}\n".format(pin)
-
-            iosettings[pin] = {k: unquote(v) for k, v in params.items()}
-            index += 1
+_IBUF_TMPL = """
+    IBUF # ({params}) ibuf_{index} (
+    .I(inp[{index}]),
+    .O(inp_b[{index}])
+    );
 
-    # Footer
-    verilog += """
-endmodule
+    always @(posedge clk_bufg)
+        led[{index}] <= inp_b[{index}];
 """
 
-    return verilog, pcf, "", iosettings
-
-
-def generate_input(board, iostandard, in_terms, vref):
-    """
-    Generates a design with singnals from external pins go through IBUFs and
-    registers to LEDs. Each IBUF has differen IN_TERM setting.
-    """
-
-    num_ports = len(in_terms)
-    iosettings = {}
-    used_iobanks = set()
-
-    # Header
-    verilog = """
-module top(
-    input  wire clk,
-    input  wire [{N}:0] inp,
-    output reg  [{N}:0] led
-);
-
-    initial led <= 0;
-""".format(N=num_ports - 1)
-
-    pcf = """
-set_io clk {}
-""".format(PINOUT[board]["clock"])
-
-    # BUFG
-    verilog += """
-    wire  clk_bufg;
+_IOBUF_TMPL = """
+    IOBUF # ({params}) iobuf_{index} (
+    .I(ino_o),
+    .O(ino_i[{index}]),
+    .T(ino_t),
+    .IO(ino[{index}])
+    );
+            """
 
-    BUFG bufg (.I(clk), .O(clk_bufg));
+_OBUFDS_TMPL = """
+    OBUFDS # ({params}) obuf_{index} (
+    .I(tick),
+    .O(out_p[{index}]),
+    .OB(out_n[{index}])
+    );
 """
 
-    verilog += """
-    wire inp_b[{}:0];
-""".format(len(in_terms) - 1)
-
-    # Input buffers + registers
-    index = 0
-    for in_term in in_terms:
-
-        params = {
-            "IOSTANDARD": "\"{}\"".format(iostandard),
-        }
-
-        if in_term is not None:
-            params["IN_TERM"] = "\"{}\"".format(in_term)
-
-        iobank, pin = PINOUT[board]["single-ended"][index]
-        used_iobanks.add(iobank)
-
-        verilog += """
-    IBUF # ({params}) ibuf_{index} (
-    .I(inp[{index}]),
+_IBUFDS_TMPL = """
+    IBUFDS # ({params}) ibuf_{index} (
+    .I(inp_p[{index}]),
+    .IB(inp_n[{index}]),
     .O(inp_b[{index}])
     );
 
     always @(posedge clk_bufg)
         led[{index}] <= inp_b[{index}];
-""".format(
-            params=",".join(
-                [".{}({})".format(k, v) for k, v in params.items()]
-            ),
-            index=index
-        )
-
-        if num_ports > 1:
-            pcf += "set_io inp[{}] {}\n".format(index, pin)
-            pcf += "set_io led[{}] {}\n".format(
-                index, PINOUT[board]["led"][index]
-            )
-        else:
-            pcf += "set_io inp {}\n".format(pin)
-            pcf += "set_io led {}\n".format(PINOUT[board]["led"][index])
+"""
 
-        iosettings[pin] = {k: unquote(v) for k, v in params.items()}
-        index += 1
+_IOBUFDS_TMPL = """
+    IOBUFDS # ({params}) iobuf_{index} (
+    .I(ino_o),
+    .O(ino_i[{index}]),
+    .T(ino_t),
+    .IO(ino_p[{index}]),
+    .IOB(ino_n[{index}])
+    );
+"""
 
-    # Footer
-    verilog += """
+_FOOTER = """
 endmodule
 """
 
-    # VREF
-    tcl = ""
-    if vref is not None:
-        for iobank in used_iobanks:
-            tcl += "set_property INTERNAL_VREF {} [get_iobanks {}]\n".format(
-                vref, iobank
-            )
-
-    return verilog, pcf, tcl, iosettings
+# Clock buffer & control logic blocks. These are fully static, so they are
+# emitted as-is without any per-invocation formatting.
 
+# 100Hz square wave generator
+_CLK_GEN_TICK = """
+    wire        clk_bufg;
+    reg  [31:0] cnt_ps;
+    reg         tick;
 
-def generate_inout(board, iostandard, drives, slews, vref):
-    """
-    Generates a design with INOUT buffers. Buffers cycle through states:
-    L,Z,H,Z with 100Hz frequency. During the Z state, IO pins are latched
-    and their state is presented on LEDs.
-    """
-
-    num_ports = len(drives) * len(slews)
-    iosettings = {}
-    used_iobanks = set()
-
-    # Header
-    verilog = """
-module top(
-    input  wire clk,
-    inout  wire [{N}:0] ino,
-    output reg  [{N}:0] led
-);
-
-    initial led <= 0;
-
-    wire [{N}:0] ino_i;
-    reg ino_o;
-    reg ino_t;
+    BUFG bufg (.I(clk), .O(clk_bufg));
 
-""".format(N=num_ports - 1)
+    initial cnt_ps <= 0;
+    initial tick   <= 0;
 
-    pcf = """
-set_io clk {}
-""".format(PINOUT[board]["clock"])
+    always @(posedge clk_bufg)
+        if (cnt_ps >= (100000000 / (2*100)) - 1) begin
+            cnt_ps <= 0;
+            tick   <= !tick;
+        end else begin
+            cnt_ps <= cnt_ps + 1;
+            tick   <= tick;
+        end
+"""
 
-    # Control signal generator, data sampler
-    verilog += """
+# Control signal generator, data sampler
+_CLK_GEN_IOT = """
     wire        clk_bufg;
     reg  [31:0] cnt_ps;
 
@@ -421,170 +292,63 @@ set_io clk {}
             led <= led;
 """
 
-    # INOUT buffers
-    index = 0
-    for slew in slews:
-        for drive in drives:
-
-            params = {"IOSTANDARD": "\"{}\"".format(iostandard)}
-
-            if drive is not None:
-                params["DRIVE"] = int(drive)
-
-            if slew is not None:
-                params["SLEW"] = "\"{}\"".format(slew)
-
-            iobank, pin = PINOUT[board]["single-ended"][index]
-            used_iobanks.add(iobank)
-
-            verilog += """
-    IOBUF # ({params}) iobuf_{index} (
-    .I(ino_o),
-    .O(ino_i[{index}]),
-    .T(ino_t),
-    .IO(ino[{index}])
-    );
-            """.format(
-                params=",".join(
-                    [".{}({})".format(k, v) for k, v in params.items()]
-                ),
-                index=index
-            )
-
-            if num_ports > 1:
-                pcf += "set_io ino[{}] {}\n".format(index, pin)
-                pcf += "set_io led[{}] {}\n".format(
-                    index, PINOUT[board]["led"][index]
-                )
-            else:
-                pcf += "set_io ino {}\n".format(pin)
-                pcf += "set_io led {}\n".format(PINOUT[board]["led"][index])
-
-            iosettings[pin] = {k: unquote(v) for k, v in params.items()}
-            index += 1
+# BUFG only
+_CLK_GEN_BUFG = """
+    wire  clk_bufg;
 
-    # Footer
-    verilog += """
-endmodule
+    BUFG bufg (.I(clk), .O(clk_bufg));
 """
 
-    # VREF
-    tcl = ""
-    if vref is not None:
-        for iobank in used_iobanks:
-            tcl += "set_property INTERNAL_VREF {} [get_iobanks {}]\n".format(
-                vref, iobank
-            )
-
-    return verilog, pcf, tcl, iosettings
-
+# Intermediate input wires declared by the input modes
+_INP_WIRES_TMPL = """
+    wire inp_b[{}:0];
+"""
 
 # =============================================================================
 
-
-def generate_diff_output(board, iostandard, drives, slews):
-    """
-    Generates a design which outputs 100Hz square wave to a number of pins
-    in which each one has different DRIVE+SLEW setting. The IOSTANDARD is
-    common for all of them.
-    """
-
-    num_ports = len(drives) * len(slews)
-    iosettings = {}
-
-    # Header
-    verilog = """
+# Module header templates, one per generation mode. Each is formatted once
+# per invocation with the top port index N.
+_HEADER_OUTPUT = """
 module top(
     input  wire clk,
-    output wire [{N}:0] out_p,
-    output wire [{N}:0] out_n
+    output wire [{N}:0] out
 );
-""".format(N=num_ports - 1)
-
-    pcf = """
-set_io clk {}
-""".format(PINOUT[board]["clock"])
-
-    # 100Hz square wave generator
-    verilog += """
-    wire        clk_bufg;
-    reg  [31:0] cnt_ps;
-    reg         tick;
-
-    BUFG bufg (.I(clk), .O(clk_bufg));
-
-    initial cnt_ps <= 0;
-    initial tick   <= 0;
-
-    always @(posedge clk_bufg)
-        if (cnt_ps >= (100000000 / (2*100)) - 1) begin
-            cnt_ps <= 0;
-            tick   <= !tick;
-        end else begin
-            cnt_ps <= cnt_ps + 1;
-            tick   <= tick;
-        end
 """
 
-    # Output buffers
-    index = 0
-    for slew in slews:
-        for drive in drives:
-
-            params = {"IOSTANDARD": "\"{}\"".format(iostandard)}
-
-            if drive is not None:
-                params["DRIVE"] = int(drive)
-
-            if slew is not None:
-                params["SLEW"] = "\"{}\"".format(slew)
+_HEADER_INPUT = """
+module top(
+    input  wire clk,
+    input  wire [{N}:0] inp,
+    output reg  [{N}:0] led
+);
 
-            iobank, *pins = PINOUT[board]["differential"][index]
+    initial led <= 0;
+"""
 
-            verilog += """
-    OBUFDS # ({params}) obuf_{index} (
-    .I(tick),
-    .O(out_p[{index}]),
-    .OB(out_n[{index}])
-    );
-""".format(
-                params=",".join(
-                    [".{}({})".format(k, v) for k, v in params.items()]
-                ),
-                index=index
-            )
+_HEADER_INOUT = """
+module top(
+    input  wire clk,
+    inout  wire [{N}:0] ino,
+    output reg  [{N}:0] led
+);
 
-            if num_ports > 1:
-                pcf += "set_io out_p[{}] {}\n".format(index, pins[0])
-                pcf += "set_io out_n[{}] {}\n".format(index, pins[1])
-            else:
-                pcf += "set_io out_p {}\n".format(pins[0])
-                pcf += "set_io out_n {}\n".format(pins[1])
+    initial led <= 0;
 
-            iosettings[pins[0]] = {k: unquote(v) for k, v in params.items()}
-            iosettings[pins[1]] = {k: unquote(v) for k, v in params.items()}
-            index += 1
+    wire [{N}:0] ino_i;
+    reg ino_o;
+    reg ino_t;
 
-    # Footer
-    verilog += """
-endmodule
 """
 
-    return verilog, pcf, "", iosettings
-
-
-def generate_diff_input(board, iostandard, in_terms, vref):
-    """
-    Generates a design with singnals from external pins go through IBUFs and
-    registers to LEDs. Each IBUF has differen IN_TERM setting.
-    """
-
-    num_ports = len(in_terms)
-    iosettings = {}
-    used_iobanks = set()
+_HEADER_DIFF_OUTPUT = """
+module top(
+    input  wire clk,
+    output wire [{N}:0] out_p,
+    output wire [{N}:0] out_n
+);
+"""
 
-    # Header
-    verilog = """
+_HEADER_DIFF_INPUT = """
 module top(
     input  wire clk,
     input  wire [{N}:0] inp_p,
@@ -593,205 +357,294 @@ module top(
 );
 
     initial led <= 0;
-""".format(N=num_ports - 1)
+"""
 
-    pcf = """
-set_io clk {}
-""".format(PINOUT[board]["clock"])
+_HEADER_DIFF_INOUT = """
+module top(
+    input  wire clk,
+    inout  wire [{N}:0] ino_p,
+    inout  wire [{N}:0] ino_n,
+    output reg  [{N}:0] led
+);
 
-    # BUFG
-    verilog += """
-    wire  clk_bufg;
+    initial led <= 0;
+
+    wire [{N}:0] ino_i;
+    reg ino_o;
+    reg ino_t;
 
-    BUFG bufg (.I(clk), .O(clk_bufg));
 """
 
-    verilog += """
-    wire inp_b[{}:0];
-""".format(len(in_terms) - 1)
+# Per-mode configuration for generate():
+#
+#  - "differential": whether the mode uses differential pin pairs,
+#  - "settings": which IO settings vary per port,
+#  - "clk_gen": which clock / control logic block to emit,
+#  - "track_banks": whether IO banks of used pins are collected,
+#  - "header": module header template,
+#  - "buffer": per-port IO buffer template,
+#  - "pcf_signals": (signal name, pin source) pairs emitted to the PCF
+#    for each port,
+#  - "vref_banks": which iobanks get INTERNAL_VREF when a vref is given.
+MODE_CONFIG = {
+    "output":
+        {
+            "differential": False,
+            "settings": "drive_slew",
+            "clk_gen": _CLK_GEN_TICK,
+            "track_banks": False,
+            "header": _HEADER_OUTPUT,
+            "buffer": _OBUF_TMPL,
+            "pcf_signals": (("out", "pin"), ),
+            "vref_banks": None,
+        },
+    "input":
+        {
+            "differential": False,
+            "settings": "in_term",
+            "clk_gen": _CLK_GEN_BUFG,
+            "track_banks": True,
+            "header": _HEADER_INPUT,
+            "buffer": _IBUF_TMPL,
+            "pcf_signals": (("inp", "pin"), ("led", "led")),
+            "vref_banks": "used",
+        },
+    "inout":
+        {
+            "differential": False,
+            "settings": "drive_slew",
+            "clk_gen": _CLK_GEN_IOT,
+            "track_banks": True,
+            "header": _HEADER_INOUT,
+            "buffer": _IOBUF_TMPL,
+            "pcf_signals": (("ino", "pin"), ("led", "led")),
+            "vref_banks": "used",
+        },
+    "diff_output":
+        {
+            "differential": True,
+            "settings": "drive_slew",
+            "clk_gen": _CLK_GEN_TICK,
+            "track_banks": True,
+            "header": _HEADER_DIFF_OUTPUT,
+            "buffer": _OBUFDS_TMPL,
+            "pcf_signals": (("out_p", "pin_p"), ("out_n", "pin_n")),
+            "vref_banks": None,
+        },
+    "diff_input":
+        {
+            "differential": True,
+            "settings": "in_term",
+            "clk_gen": _CLK_GEN_BUFG,
+            "track_banks": True,
+            "header": _HEADER_DIFF_INPUT,
+            "buffer": _IBUFDS_TMPL,
+            "pcf_signals":
+                (("inp_p", "pin_p"), ("inp_n", "pin_n"), ("led", "led")),
+            "vref_banks": "used",
+        },
+    "diff_inout":
+        {
+            "differential": True,
+            "settings": "drive_slew",
+            "clk_gen": _CLK_GEN_IOT,
+            "track_banks": True,
+            "header": _HEADER_DIFF_INOUT,
+            "buffer": _IOBUFDS_TMPL,
+            "pcf_signals":
+                (("ino_p", "pin_p"), ("ino_n", "pin_n"), ("led", "led")),
+            "vref_banks": "board",
+        },
+}
 
-    # Input buffers + registers
-    index = 0
-    for in_term in in_terms:
+# =============================================================================
 
-        params = {
-            "IOSTANDARD": "\"{}\"".format(iostandard),
-        }
+# Interned iosettings keys. String literals are interned by the compiler
+# anyway; being explicit documents the intent and keeps the pointer-equality
+# dict fast path should the keys ever be built dynamically.
+_K_IOSTANDARD = sys.intern("IOSTANDARD")
+_K_DRIVE = sys.intern("DRIVE")
+_K_SLEW = sys.intern("SLEW")
+_K_IN_TERM = sys.intern("IN_TERM")
 
-        if in_term is not None:
-            params["IN_TERM"] = "\"{}\"".format(in_term)
+# Fetches the pinout entries shared by all boards in one C-level call.
+# The optional "iobanks" entry is still looked up lazily.
+_BOARD_PINS = operator.itemgetter(
+    "clock", "led", "single-ended", "differential"
+)
 
-        iobank, *pins = PINOUT[board]["differential"][index]
-        used_iobanks.add(iobank)
 
-        verilog += """
-    IBUFDS # ({params}) ibuf_{index} (
-    .I(inp_p[{index}]),
-    .IB(inp_n[{index}]),
-    .O(inp_b[{index}])
-    );
-
-    always @(posedge clk_bufg)
-        led[{index}] <= inp_b[{index}];
-""".format(
-            params=",".join(
-                [".{}({})".format(k, v) for k, v in params.items()]
-            ),
-            index=index
-        )
-
-        if num_ports > 1:
-            pcf += "set_io inp_p[{}] {}\n".format(index, pins[0])
-            pcf += "set_io inp_n[{}] {}\n".format(index, pins[1])
-            pcf += "set_io led[{}] {}\n".format(
-                index, PINOUT[board]["led"][index]
-            )
-        else:
-            pcf += "set_io inp_p {}\n".format(pins[0])
-            pcf += "set_io inp_n {}\n".format(pins[1])
-            pcf += "set_io led {}\n".format(PINOUT[board]["led"][index])
+@functools.lru_cache(maxsize=None)
+def _format_header(mode, top_index):
+    """
+    Formats the module header for the given mode and top port index. Cached
+    so repeated generate() calls with the same shape reuse the string.
+    """
+    return MODE_CONFIG[mode]["header"].format(N=top_index)
 
-        iosettings[pins[0]] = {k: unquote(v) for k, v in params.items()}
-        iosettings[pins[1]] = {k: unquote(v) for k, v in params.items()}
-        index += 1
 
-    # Footer
-    verilog += """
-endmodule
-"""
+def generate(
+        board, mode, iostandard, drives, slews, in_terms, vref, verilog_fp,
+        pcf_fp, xdc_fp
+):
+    """
+    Generates a design exercising IO settings in the given mode.
+
+    The verilog, PCF and XDC content is streamed to the given file objects
+    as it is produced so that the whole design is never held in memory.
+    Returns the iosettings dict describing the per-pin settings.
+
+    Output modes emit a 100Hz square wave to a number of pins where each
+    one has a different DRIVE+SLEW setting. Input modes route signals from
+    external pins through input buffers and registers to LEDs, each buffer
+    with a different IN_TERM setting. Inout modes cycle buffers through
+    states L,Z,H,Z with 100Hz frequency; during the Z state IO pins are
+    latched and presented on LEDs. The IOSTANDARD is common for all ports
+    of a design.
+    """
 
-    # VREF
-    tcl = ""
-    if vref is not None:
-        for iobank in used_iobanks:
-            tcl += "set_property INTERNAL_VREF {} [get_iobanks {}]\n".format(
-                vref, iobank
-            )
+    if mode not in MODE_CONFIG:
+        raise RuntimeError("Unknown generation mode '{}'".format(mode))
+    cfg = MODE_CONFIG[mode]
 
-    return verilog, pcf, tcl, iosettings
+    # Bind the board pinout once instead of re-resolving the nested dicts
+    # for every port.
+    board_cfg = PINOUT[board]
+    clk_pin, led_pins, se_pins, diff_pins = _BOARD_PINS(board_cfg)
 
+    if cfg["settings"] == "drive_slew":
+        num_ports = len(drives) * len(slews)
+    else:
+        num_ports = len(in_terms)
 
-def generate_diff_inout(board, iostandard, drives, slews, vref):
-    """
-    Generates a design with INOUT buffers. Buffers cycle through states:
-    L,Z,H,Z with 100Hz frequency. During the Z state, IO pins are latched
-    and their state is presented on LEDs.
-    """
+    # Top port vector index, shared by the header and wire declarations.
+    top_index = num_ports - 1
 
-    num_ports = len(drives) * len(slews)
     iosettings = {}
     used_iobanks = set()
 
     # Header
-    verilog = """
-module top(
-    input  wire clk,
-    inout  wire [{N}:0] ino_p,
-    inout  wire [{N}:0] ino_n,
-    output reg  [{N}:0] led
-);
+    verilog_fp.write(_format_header(mode, top_index))
 
-    initial led <= 0;
+    pcf_lines = ["""
+set_io clk {}
+""".format(clk_pin)]
 
-    wire [{N}:0] ino_i;
-    reg ino_o;
-    reg ino_t;
+    # Clock buffer & control logic
+    verilog_fp.write(cfg["clk_gen"])
 
-""".format(N=num_ports - 1)
+    # Input modes declare the intermediate input wires
+    if cfg["settings"] == "in_term":
+        verilog_fp.write(_INP_WIRES_TMPL.format(top_index))
 
-    pcf = """
-set_io clk {}
-""".format(PINOUT[board]["clock"])
+    # Per-port parameter sets as (verilog params string, params dict)
+    # pairs. The dict holds the unquoted values that end up in iosettings.
+    iostd_part = f'.IOSTANDARD("{iostandard}")'
 
-    # Control signal generator, data sampler
-    verilog += """
-    wire        clk_bufg;
-    reg  [31:0] cnt_ps;
+    port_params = []
+    if cfg["settings"] == "drive_slew":
 
-    BUFG bufg (.I(clk), .O(clk_bufg));
+        # Validate and pre-format each drive and slew once instead of per
+        # (slew, drive) combination.
+        drives_pp = []
+        for drive in drives:
+            if drive is None:
+                drives_pp.append(None)
+            else:
+                drive_i = int(drive)
+                drives_pp.append((drive_i, f".DRIVE({drive_i})"))
 
-    initial cnt_ps <= 32'd0;
-    initial ino_o  <= 1'b0;
-    initial ino_t  <= 1'b1;
+        slews_pp = []
+        for slew in slews:
+            if slew is None:
+                slews_pp.append(None)
+            else:
+                slews_pp.append((slew, f'.SLEW("{slew}")'))
 
-    always @(posedge clk_bufg)
-        if (cnt_ps >= (100000000 / (2*100)) - 1) begin
-            cnt_ps <= 0;
-            ino_t  <= !ino_t;
-            if (ino_t == 1'b1)
-                ino_o <= !ino_o;
-        end else begin
-            cnt_ps <= cnt_ps + 1;
-            ino_t  <= ino_t;
-            ino_o  <= ino_o;
-        end
+        for slew_pp, drive_pp in itertools.product(slews_pp, drives_pp):
 
-    always @(posedge clk_bufg)
-        if (ino_t == 1'b1)
-            led <= ino_i;
-        else
-            led <= led;
-"""
+            params = {_K_IOSTANDARD: iostandard}
+            parts = [iostd_part]
 
-    # INOUT buffers
-    index = 0
-    for slew in slews:
-        for drive in drives:
+            if drive_pp is not None:
+                params[_K_DRIVE], drive_part = drive_pp
+                parts.append(drive_part)
 
-            params = {"IOSTANDARD": "\"{}\"".format(iostandard)}
+            if slew_pp is not None:
+                params[_K_SLEW], slew_part = slew_pp
+                parts.append(slew_part)
 
-            if drive is not None:
-                params["DRIVE"] = int(drive)
+            port_params.append((",".join(parts), params))
+    else:
+        for in_term in in_terms:
 
-            if slew is not None:
-                params["SLEW"] = "\"{}\"".format(slew)
+            params = {_K_IOSTANDARD: iostandard}
+            parts = [iostd_part]
 
-            iobank, *pins = PINOUT[board]["differential"][index]
-            used_iobanks.add(iobank)
+            if in_term is not None:
+                params[_K_IN_TERM] = in_term
+                parts.append(f'.IN_TERM("{in_term}")')
 
-            verilog += """
-    IOBUFDS # ({params}) iobuf_{index} (
-    .I(ino_o),
-    .O(ino_i[{index}]),
-    .T(ino_t),
-    .IO(ino_p[{index}]),
-    .IOB(ino_n[{index}])
-    );
-""".format(
-                params=",".join(
-                    [".{}({})".format(k, v) for k, v in params.items()]
-                ),
-                index=index
-            )
+            port_params.append((",".join(parts), params))
+
+    # IO buffers
+    for index, (params_str, params) in enumerate(port_params):
+
+        if cfg["differential"]:
+            iobank, *pins = diff_pins[index]
+            used_iobanks.add(iobank)
+        elif cfg["track_banks"]:
+            iobank, pin = se_pins[index]
+            used_iobanks.add(iobank)
+        else:
+            # Only the pin is needed, the iobank is not tracked.
+            pin = se_pins[index][1]
+
+        verilog_fp.write(cfg["buffer"].format(params=params_str, index=index))
+
+        for name, src in cfg["pcf_signals"]:
+            if src == "pin":
+                io_pin = pin
+            elif src == "pin_p":
+                io_pin = pins[0]
+            elif src == "pin_n":
+                io_pin = pins[1]
+            else:
+                io_pin = led_pins[index]
 
             if num_ports > 1:
-                pcf += "set_io ino_p[{}] {}\n".format(index, pins[0])
-                pcf += "set_io ino_n[{}] {}\n".format(index, pins[1])
-                pcf += "set_io led[{}] {}\n".format(
-                    index, PINOUT[board]["led"][index]
-                )
+                pcf_lines.append(f"set_io {name}[{index}] {io_pin}\n")
             else:
-                pcf += "set_io ino_p {}\n".format(pins[0])
-                pcf += "set_io ino_n {}\n".format(pins[1])
-                pcf += "set_io led {}\n".format(PINOUT[board]["led"][index])
+                pcf_lines.append(f"set_io {name} {io_pin}\n")
 
-            iosettings[pins[0]] = {k: unquote(v) for k, v in params.items()}
-            iosettings[pins[1]] = {k: unquote(v) for k, v in params.items()}
-            index += 1
+        if cfg["differential"]:
+            for p in pins:
+                iosettings[p] = params
+        else:
+            iosettings[pin] = params
 
     # Footer
-    verilog += """
-endmodule
-"""
+    verilog_fp.write(_FOOTER)
+
+    pcf_fp.writelines(pcf_lines)
 
-    tcl = ""
+    # VREF
     if vref is not None:
-        for iobank in PINOUT[board]["iobanks"]:
-            tcl += "set_property INTERNAL_VREF {} [get_iobanks {}]\n".format(
-                vref, iobank
+        if cfg["vref_banks"] == "used":
+            banks = used_iobanks
+        elif cfg["vref_banks"] == "board":
+            banks = board_cfg["iobanks"]
+        else:
+            banks = ()
+
+        for iobank in banks:
+            xdc_fp.write(
+                "set_property INTERNAL_VREF {} [get_iobanks {}]\n".format(
+                    vref, iobank
+                )
             )
 
-    return verilog, pcf, tcl, iosettings
+    return iosettings
 
 
 # =============================================================================
@@ -802,7 +655,12 @@ def main():
     # Parse arguments
     parser = argparse.ArgumentParser()
     parser.add_argument("--board", required=True, help="Board")
-    parser.add_argument("--mode", required=True, help="Generation mode")
+    parser.add_argument(
+        "--mode",
+        required=True,
+        choices=sorted(MODE_CONFIG.keys()),
+        help="Generation mode"
+    )
     parser.add_argument("--iostandard", required=True, help="IOSTANDARD")
     parser.add_argument(
         "--drive", required=False, nargs="+", default=[None], help="DRIVE(s)"
@@ -822,45 +680,30 @@ def main():
 
     args = parser.parse_args()
 
-    # Generate design for output IO settings
-    if args.mode == "output":
-        verilog, pcf, tcl, iosettings = generate_output(
-            args.board, args.iostandard, args.drive, args.slew
-        )
-    elif args.mode == "input":
-        verilog, pcf, tcl, iosettings = generate_input(
-            args.board, args.iostandard, args.in_term, args.vref
-        )
-    elif args.mode == "inout":
-        verilog, pcf, tcl, iosettings = generate_inout(
-            args.board, args.iostandard, args.drive, args.slew, args.vref
-        )
-    elif args.mode == "diff_output":
-        verilog, pcf, tcl, iosettings = generate_diff_output(
-            args.board, args.iostandard, args.drive, args.slew
-        )
-    elif args.mode == "diff_input":
-        verilog, pcf, tcl, iosettings = generate_diff_input(
-            args.board, args.iostandard, args.in_term, args.vref
+    # Generate the design, streaming verilog, PCF and XDC directly to the
+    # output files.
+    with open(args.o + ".v", "w") as verilog_fp, \
+            open(args.o + ".pcf", "w") as pcf_fp, \
+            open(args.o + ".xdc", "w") as xdc_fp:
+        iosettings = generate(
+            args.board, args.mode, args.iostandard, args.drive, args.slew,
+            args.in_term, args.vref, verilog_fp, pcf_fp, xdc_fp
         )
-    elif args.mode == "diff_inout":
-        verilog, pcf, tcl, iosettings = generate_diff_inout(
-            args.board, args.iostandard, args.drive, args.slew, args.vref
-        )
-    else:
-        raise RuntimeError("Unknown generation mode '{}'".format(args.mode))
-
-    # Write verilog
-    with open(args.o + ".v", "w") as fp:
-        fp.write(verilog)
 
-    # Write PCF
-    with open(args.o + ".pcf", "w") as fp:
-        fp.write(pcf)
-
-    # Write XDC
-    with open(args.o + ".xdc", "w") as fp:
-        fp.write(tcl)
+    # Write IO settings. The import is deferred so that the encoder is
+    # only loaded when a design actually gets generated. The structure is a
+    # flat {pin: {setting: value}} dict, so emit one pin entry per line
+    # instead of walking the whole thing through the generic encoder.
+    import json
+    with open(args.o + ".json", "w") as fp:
+        fp.write("{\n")
+        fp.write(
+            ",\n".join(
+                "  {}: {}".format(json.dumps(pin), json.dumps(entry))
+                for pin, entry in iosettings.items()
+            )
+        )
+        fp.write("\n}\n")
 
 
 if __name__ == "__main__":